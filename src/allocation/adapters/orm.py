@@ -1,14 +1,31 @@
-from sqlalchemy import Table, Column, Integer, String, Date, ForeignKey, MetaData
-from sqlalchemy.orm import relationship, registry
+import sys
+from operator import attrgetter
+
+from sqlalchemy import Table, Column, Integer, String, Date, ForeignKey, Index, MetaData, event
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.orm import keyfunc_mapping, relationship, registry
 from allocation.domain import models
 
 metadata = MetaData()
 
+
+class InternedString(TypeDecorator):
+    """
+    String column whose loaded values are interned, so objects loaded from
+    the database share SKU strings just like those built in the domain.
+    """
+    impl = String
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else sys.intern(value)
+
+
 order_lines = Table(
     "order_lines", metadata,
     Column("id", Integer, primary_key=True, autoincrement=True),
     Column("orderid", String(255)),
-    Column("sku", String(255)),
+    Column("sku", InternedString(255)),
     Column("qty", Integer, nullable=False),
 )
 
@@ -16,9 +33,22 @@ batches = Table(
     "batches", metadata,
     Column("id", Integer, primary_key=True, autoincrement=True),
     Column("reference", String(255)),
-    Column("sku", String(255), ForeignKey("products.sku")),
+    Column("sku", InternedString(255), ForeignKey("products.sku")),
     Column("purchased_quantity", Integer, nullable=False),
     Column("eta", Date, nullable=True),
+    Index("ix_batches_reference", "reference", unique=True),
+)
+
+# Matches the selectin load of Product.batches (WHERE sku IN ... ORDER BY
+# eta IS NOT NULL, eta, id), so the database can return batches without a
+# sort step. The leading expression puts undated batches first on every
+# backend without NULLS FIRST, which MySQL does not accept.
+Index(
+    "ix_batches_sku_eta",
+    batches.c.sku,
+    batches.c.eta.is_not(None),
+    batches.c.eta,
+    batches.c.id,
 )
 
 allocations = Table(
@@ -30,11 +60,22 @@ allocations = Table(
 
 products = Table(
     "products", metadata,
-    Column("sku", String(255), primary_key=True),
+    Column("sku", InternedString(255), primary_key=True),
     Column("version_number", Integer, nullable=False, default=1),
 )
 mapper_registry = registry()
 
+
+def _reset_allocated_qty(batch: models.Batch, *args) -> None:
+    """
+    Drop a batch's cached allocated quantity when the ORM expires or refreshes
+    its state, so it is recomputed from the reloaded allocations.
+    """
+    # Expiry can run for an instance that has already been garbage collected
+    if batch is not None:
+        batch._allocated_qty = None
+
+
 def start_mappers():
     mapper_registry.map_imperatively(models.OrderLine, order_lines)
 
@@ -42,12 +83,22 @@ def start_mappers():
         "_allocations": relationship(
             models.OrderLine,
             secondary=allocations,
-            collection_class=set,
+            collection_class=keyfunc_mapping(attrgetter("orderid", "sku")),
         ),
         "_purchased_quantity": batches.c.purchased_quantity,
     })
 
     mapper_registry.map_imperatively(models.Product, products, properties={
-        "batches": relationship(models.Batch, collection_class=list),
+        # Batches come back in allocation preference order (earliest ETA first,
+        # in-stock batches before any dated one), so Product never sorts them.
+        "batches": relationship(
+            models.Batch,
+            collection_class=list,
+            order_by=[batches.c.eta.is_not(None), batches.c.eta, batches.c.id],
+        ),
         "version_number": products.c.version_number,
-    })
\ No newline at end of file
+    })
+
+    for identifier in ("expire", "refresh"):
+        if not event.contains(models.Batch, identifier, _reset_allocated_qty):
+            event.listen(models.Batch, identifier, _reset_allocated_qty)
\ No newline at end of file
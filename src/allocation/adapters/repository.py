@@ -1,7 +1,57 @@
-from sqlalchemy.orm import selectinload, Session, Query
+from typing import Iterable
+
+from sqlalchemy import Select, bindparam, select
+from sqlalchemy.orm import raiseload, selectinload, Session
 from allocation.domain import models
 from allocation.service_layer.ports import AbstractProductRepository
 
+
+def _product_load_options() -> tuple:
+    """
+    Loader options shared by every query that returns Product aggregates.
+    """
+    return (
+        selectinload(models.Product.batches).selectinload(models.Batch._allocations),
+        # Fail loudly on any relationship that was not eager loaded above
+        raiseload("*"),
+    )
+
+
+def _get_product_stmt() -> Select:
+    """
+    Statement for loading a Product by SKU. The SKU is a bound parameter, so
+    every call has the same structure and hits the engine's compiled cache.
+    """
+    return (
+        select(models.Product)
+        .where(models.Product.sku == bindparam("sku"))
+        .options(*_product_load_options())
+    )
+
+
+def _get_product_by_batchref_stmt() -> Select:
+    """
+    Statement for loading the Product that owns a given batch reference.
+    """
+    return (
+        select(models.Product)
+        .join(models.Product.batches)
+        .where(models.Batch.reference == bindparam("ref"))
+        .options(*_product_load_options())
+    )
+
+
+def _get_products_stmt() -> Select:
+    """
+    Statement for loading several Products by SKU in one round trip.
+    """
+    return (
+        select(models.Product)
+        .where(models.Product.sku.in_(bindparam("skus", expanding=True)))
+        .options(*_product_load_options())
+    )
+
+
 class SqlAlchemyProductRepository(AbstractProductRepository):
     def __init__(self, session: Session):
         self.session: Session = session
@@ -10,9 +60,13 @@ class SqlAlchemyProductRepository(AbstractProductRepository):
         self.session.add(product)
 
     def get(self, sku: str) -> models.Product | None:
-        query: Query[models.Product] = (
-            self.session.query(models.Product)
-            .filter_by(sku=sku)
-            .options(selectinload(models.Product.batches))
-        )
-        return query.first()
\ No newline at end of file
+        return self.session.execute(_get_product_stmt(), {"sku": sku}).scalar_one_or_none()
+
+    def get_by_batchref(self, ref: str) -> models.Product | None:
+        return self.session.execute(
+            _get_product_by_batchref_stmt(), {"ref": ref}
+        ).scalar_one_or_none()
+
+    def get_many(self, skus: Iterable[str]) -> dict[str, models.Product]:
+        products = self.session.execute(_get_products_stmt(), {"skus": list(skus)}).scalars()
+        return {product.sku: product for product in products}
\ No newline at end of file
@@ -1,15 +1,16 @@
+import sys
 from dataclasses import dataclass
 from datetime import timedelta
 from typing import Optional
 
-@dataclass
+@dataclass(slots=True)
 class Command:
     """
     Base class for all commands.
     """
     pass
 
-@dataclass
+@dataclass(slots=True)
 class CreateBatch(Command):
     """
     Command to create a new batch of stock.
@@ -19,7 +20,10 @@ class CreateBatch(Command):
     qty: int
     eta: Optional[timedelta] = None
 
-@dataclass
+    def __post_init__(self):
+        self.sku = sys.intern(self.sku)
+
+@dataclass(slots=True)
 class Allocate(Command):
     """
     Command to allocate an order line to a batch.
@@ -28,7 +32,10 @@ class Allocate(Command):
     sku: str
     qty: int
 
-@dataclass
+    def __post_init__(self):
+        self.sku = sys.intern(self.sku)
+
+@dataclass(slots=True)
 class ChangeBatchQuantity(Command):
     """
     Command to change the quantity of a batch.
@@ -7,8 +7,15 @@ from dataclasses import dataclass
 # occurrences in the domain. They are used to notify other parts of the
 # system about changes in the state of the domain.
 
-@dataclass(frozen=True)
-class BatchAllocated:
+@dataclass(frozen=True, slots=True)
+class Event:
+    """
+    Base class for all domain events.
+    """
+
+
+@dataclass(frozen=True, slots=True)
+class BatchAllocated(Event):
     """
     Event triggered when an order line is successfully allocated to a batch.
     """
@@ -18,8 +25,8 @@ class BatchAllocated:
     batchref: str
 
 
-@dataclass(frozen=True)
-class OutOfStock:
+@dataclass(frozen=True, slots=True)
+class OutOfStock(Event):
     """
     Event triggered when a batch runs out of stock for a specific SKU.
     """
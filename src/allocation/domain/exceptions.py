@@ -2,24 +2,146 @@ class CannotAllocateError(Exception):
     """
     Raised when an order line cannot be allocated to a batch.
 
+    Build it with one of the factory classmethods, which store only the raw
+    details; the message is formatted from the template for `reason` only
+    when read. A plain message string is also accepted, in which case
+    `reason` is None.
+
     Attributes:
+        reason: Which allocation rule failed (a key of _TEMPLATES), or None.
         orderid: The ID of the order that failed to allocate.
         sku: The SKU of the product that failed to allocate.
         qty: The quantity that could not be allocated.
-        message: A detailed error message.
+        batchref: The batch that rejected the line, if any.
+        product_sku: The SKU of the product the line was sent to, if it differs.
+        message: A detailed error message, formatted when read.
     """
+    _TEMPLATES = {
+        "out_of_stock": "Cannot allocate {qty} units of SKU '{sku}' for order '{orderid}'.",
+        "insufficient_stock": "Batch {batchref} cannot allocate {qty} units of {sku}.",
+        "sku_mismatch": "SKU mismatch: {sku} not in product {product_sku}",
+        "conflicting_allocation": "Batch {batchref} already holds order '{orderid}' for {sku} with a quantity other than {qty}.",
+    }
+    # Details only some reasons use; the factories set them only when needed.
+    batchref = None
+    product_sku = None
 
-    def __init__(self, orderid: str, sku: str, qty: int, message: str = None):
+    def __init__(
+        self,
+        message: str = None,
+        *,
+        reason: str = None,
+        orderid: str = None,
+        sku: str = None,
+        qty: int = None,
+        batchref: str = None,
+        product_sku: str = None,
+    ):
         """
-        Initialize the exception with details about the allocation failure.
+        Initialize the exception with either a message or the failure details.
+
+        Prefer the factory classmethods, which require the details each
+        reason needs.
 
+        :param message: A custom error message.
+        :param reason: Which allocation rule failed; selects the message template.
         :param orderid: The ID of the order that failed to allocate.
         :param sku: The SKU of the product that failed to allocate.
         :param qty: The quantity that could not be allocated.
-        :param message: A custom error message (optional).
+        :param batchref: The batch that rejected the line (for "insufficient_stock").
+        :param product_sku: The SKU of the product the line was sent to (for "sku_mismatch").
+        :raises ValueError: If `reason` is not a known template.
         """
+        if reason is not None and reason not in self._TEMPLATES:
+            raise ValueError(f"Unknown CannotAllocateError reason: {reason!r}")
+        # Only the message is positional; the details are restored from
+        # __dict__ when unpickling, so args must not carry them.
+        self.args = (message,)
+        self._message = message
+        self.reason = reason
         self.orderid = orderid
         self.sku = sku
         self.qty = qty
-        self.message = message or f"Cannot allocate {qty} units of SKU '{sku}' for order '{orderid}'."
-        super().__init__(self.message)
\ No newline at end of file
+        self.batchref = batchref
+        self.product_sku = product_sku
+
+    @classmethod
+    def _from_details(cls, reason: str, orderid: str, sku: str, qty: int) -> "CannotAllocateError":
+        """
+        Build an instance for one of the factories without going through
+        __init__'s keyword handling; the factory signatures already
+        guarantee the fields their template needs.
+        """
+        error = cls.__new__(cls, None)  # args == (None,), as __init__ sets
+        error._message = None
+        error.reason = reason
+        error.orderid = orderid
+        error.sku = sku
+        error.qty = qty
+        return error
+
+    @classmethod
+    def out_of_stock(cls, orderid: str, sku: str, qty: int) -> "CannotAllocateError":
+        """
+        No batch of the product has enough stock for the line.
+        """
+        return cls._from_details("out_of_stock", orderid, sku, qty)
+
+    @classmethod
+    def insufficient_stock(cls, batchref: str, orderid: str, sku: str, qty: int) -> "CannotAllocateError":
+        """
+        A specific batch cannot take the line.
+        """
+        error = cls._from_details("insufficient_stock", orderid, sku, qty)
+        error.batchref = batchref
+        return error
+
+    @classmethod
+    def sku_mismatch(cls, orderid: str, sku: str, qty: int, product_sku: str) -> "CannotAllocateError":
+        """
+        The line was sent to a product with a different SKU.
+        """
+        error = cls._from_details("sku_mismatch", orderid, sku, qty)
+        error.product_sku = product_sku
+        return error
+
+    @classmethod
+    def conflicting_allocation(cls, batchref: str, orderid: str, sku: str, qty: int) -> "CannotAllocateError":
+        """
+        The batch already holds the same order and SKU with a different quantity.
+        """
+        error = cls._from_details("conflicting_allocation", orderid, sku, qty)
+        error.batchref = batchref
+        return error
+
+    @property
+    def message(self) -> str:
+        """
+        The error message; formatted from the stored details only when read.
+        """
+        if self.reason is None:
+            return self._message or ""
+        return self._TEMPLATES[self.reason].format(
+            orderid=self.orderid,
+            sku=self.sku,
+            qty=self.qty,
+            batchref=self.batchref,
+            product_sku=self.product_sku,
+        )
+
+    def __str__(self) -> str:
+        return self.message
+
+    def __repr__(self) -> str:
+        if self.reason is None:
+            return f"{type(self).__name__}({self._message!r})"
+        details = {
+            "reason": self.reason,
+            "orderid": self.orderid,
+            "sku": self.sku,
+            "qty": self.qty,
+            "batchref": self.batchref,
+            "product_sku": self.product_sku,
+        }
+        fields = ", ".join(f"{name}={value!r}" for name, value in details.items() if value is not None)
+        return f"{type(self).__name__}({fields})"
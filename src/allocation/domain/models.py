@@ -1,24 +1,36 @@
+import sys
+from bisect import insort
 from dataclasses import dataclass
-from typing import Set, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import timedelta, date
 
 from .exceptions import CannotAllocateError
 from .events import BatchAllocated, OutOfStock
 
+# Batches without an ETA (already in stock) sort before any dated batch.
+_DATE_MIN = date.min
+
 # ------------------------------
 # 1. VALUE OBJECT
 # ------------------------------
 
-@dataclass(frozen=True)
+# No slots=True or frozen=True here: the ORM maps this class imperatively
+# and needs a per-instance __dict__ (and weakref support) for instance
+# state, which it attaches with a plain setattr.
+@dataclass(unsafe_hash=True)
 class OrderLine:
     """
     Represents an order line as a Value Object.
-    Immutable and equality is based on its data.
+    Treated as immutable; equality and hash are based on its data.
     """
     orderid: str  # Unique identifier for the order
     sku: str      # Stock Keeping Unit (product identifier)
     qty: int      # Quantity of the product in the order
 
+    def __post_init__(self):
+        # SKUs repeat across many lines; share one string object per SKU
+        object.__setattr__(self, "sku", sys.intern(self.sku))
+
 
 # ------------------------------
 # 2. ENTITY
@@ -29,6 +41,10 @@ class Batch:
     Represents a batch of products (Entity).
     Tracks allocations, ensures business invariants, and records domain events.
     """
+    # Running total of allocated quantity. Instances loaded by the ORM skip
+    # __init__, so they fall back to this default and compute it on first use.
+    _allocated_qty: Optional[int] = None
+
     def __init__(self, ref: str, sku: str, purchased_qty: int, eta: Optional[timedelta] = None):
         """
         Initialize a Batch instance.
@@ -39,23 +55,25 @@ class Batch:
         :param eta: Estimated time of arrival for the batch (optional).
         """
         self.reference = ref  # Unique identifier for the batch
-        self.sku = sku  # SKU of the product in this batch
+        self.sku = sys.intern(sku)  # SKU of the product in this batch
         self.eta = eta  # Estimated time of arrival (optional)
         self._purchased_quantity = purchased_qty  # Total quantity purchased
-        self._allocations: Set[OrderLine] = set()  # Set of allocated order lines
+        # Allocated order lines, keyed by (orderid, sku)
+        self._allocations: Dict[Tuple[str, str], OrderLine] = {}
+        self._allocated_qty = 0  # Running total of allocated quantity
         self.events: List[object] = []  # List of domain events triggered by this batch
 
     def __eq__(self, other: object) -> bool:
         """
         Check equality based on the batch reference.
         """
-        if not isinstance(other, Batch):
-            return False
-        return other.reference == self.reference
+        # Exact type check: Batch is never subclassed, and this skips the MRO walk
+        return type(other) is Batch and other.reference == self.reference
 
     def __hash__(self):
         """
         Hash the batch based on its reference.
+        The str object caches its own hash, so this needs no extra cache.
         """
         return hash(self.reference)
 
@@ -64,7 +82,9 @@ class Batch:
         """
         Total quantity allocated to this batch.
         """
-        return sum(line.qty for line in self._allocations)
+        if self._allocated_qty is None:
+            self._allocated_qty = sum(line.qty for line in self._allocations.values())
+        return self._allocated_qty
 
     @property
     def available_qty(self) -> int:
@@ -87,19 +107,24 @@ class Batch:
         Allocate an order line to this batch.
 
         :param line: The order line to allocate.
-        :raises CannotAllocateError: If the batch cannot allocate the order line.
+        :raises CannotAllocateError: If the batch cannot allocate the order line,
+            or already holds the same order and SKU with a different quantity.
         """
         if not self.can_allocate(line):
-            raise CannotAllocateError(
-                f"Batch {self.reference} cannot allocate {line.qty} units of {line.sku}."
-            )
+            raise CannotAllocateError.insufficient_stock(self.reference, line.orderid, line.sku, line.qty)
 
-        if line in self._allocations:
+        key = (line.orderid, line.sku)
+        allocated = self._allocations.get(key)
+        if allocated is not None:
             # Allocation is idempotent; if already allocated, do nothing.
-            return
+            if allocated == line:
+                return
+            # The key only covers (orderid, sku); a different qty is a conflict.
+            raise CannotAllocateError.conflicting_allocation(self.reference, line.orderid, line.sku, line.qty)
 
         # Add the order line to the allocations
-        self._allocations.add(line)
+        self._allocations[key] = line
+        self._allocated_qty += line.qty
 
         # Record a domain event for the allocation
         self.events.append(BatchAllocated(
@@ -119,12 +144,24 @@ class Batch:
 
         :param line: The order line to deallocate.
         """
-        if line in self._allocations:
+        key = (line.orderid, line.sku)
+        # Only remove the line that was allocated, not one that shares its key
+        if self._allocations.get(key) == line:
+            allocated_qty = self.allocated_qty
             # Remove the order line from the allocations
-            self._allocations.remove(line)
+            removed = self._allocations.pop(key)
+            self._allocated_qty = allocated_qty - removed.qty
             # Optionally, you could emit a domain event for deallocation
 
 
+def _eta_key(batch: Batch) -> date:
+    """
+    Sort key for batch allocation preference (earliest ETA first).
+    """
+    eta = batch.eta
+    return _DATE_MIN if eta is None else eta
+
+
 # ------------------------------
 # 3. AGGREGATE ROOT
 # ------------------------------
@@ -141,8 +178,17 @@ class Product:
         :param sku: Stock Keeping Unit (product identifier) for the product.
         :param batches: List of batches associated with this product.
         """
-        self.sku = sku
-        self.batches = batches
+        self.sku = sys.intern(sku)
+        # Kept in allocation preference order; the ORM loads it pre-sorted.
+        self.batches = sorted(batches, key=_eta_key)
+
+    def add_batch(self, batch: Batch):
+        """
+        Add a batch to the product, keeping batches ordered by ETA.
+
+        :param batch: The batch to add.
+        """
+        insort(self.batches, batch, key=_eta_key)
 
     def allocate(self, line: OrderLine) -> Optional[str]:
         """
@@ -152,16 +198,17 @@ class Product:
         :return: The reference of the batch to which the order line was allocated.
         :raises CannotAllocateError: If the order line cannot be allocated.
         """
-        if line.sku != self.sku:
-            raise CannotAllocateError(f"SKU mismatch: {line.sku} not in product {self.sku}")
+        # Handlers load the product by the line's SKU, so this is an internal
+        # invariant; it is compiled out under `python -O`
+        if __debug__ and line.sku != self.sku:
+            raise CannotAllocateError.sku_mismatch(line.orderid, line.sku, line.qty, self.sku)
         
-        # Business rule: prefer batches with the earliest ETA
-        sorted_batches = sorted(self.batches, key=lambda b: b.eta or date.min)
-        
-        for batch in sorted_batches:
+        # Business rule: prefer batches with the earliest ETA.
+        # self.batches is already kept in that order.
+        for batch in self.batches:
             if batch.can_allocate(line):
                 batch.allocate(line)
                 return batch.reference
-        
+
         # If no batch can allocate, raise an error
-        raise CannotAllocateError(f"Out of stock for {line.sku}")
\ No newline at end of file
+        raise CannotAllocateError.out_of_stock(line.orderid, line.sku, line.qty)
\ No newline at end of file
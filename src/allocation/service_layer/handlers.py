@@ -1,7 +1,12 @@
-from allocation.domain import models, commands
+import logging
+from typing import Iterator, List, Optional
+
+from allocation.domain import models, commands, events
 from allocation.service_layer.ports import AbstractUnitOfWork
 from allocation.domain.exceptions import CannotAllocateError
 
+logger = logging.getLogger(__name__)
+
 class InvalidSku(Exception):
     """Application-level exception for non-existent SKUs."""
     pass
@@ -10,36 +15,58 @@ def add_batch(command: commands.CreateBatch, uow: AbstractUnitOfWork):
     """
     Handle the CreateBatch command by adding a new batch to the repository.
     """
+    batch = models.Batch(
+        ref=command.ref,
+        sku=command.sku,
+        purchased_qty=command.qty,
+        eta=command.eta
+    )
     with uow:
         product = uow.products.get(sku=command.sku)
         if product is None:
-            product = models.Product(sku=command.sku, batches=[])
-            uow.products.add(product)
-        
-        product.batches.append(models.Batch(
-            ref=command.ref,
-            sku=command.sku,
-            purchased_qty=command.qty,
-            eta=command.eta
-        ))
+            # A new product is created with its first batch; no collection to append to
+            uow.products.add(models.Product(sku=command.sku, batches=[batch]))
+        else:
+            product.add_batch(batch)
         uow.commit()
 
+def _allocate_to_product(command: commands.Allocate, product: Optional[models.Product]) -> Optional[str]:
+    """
+    Allocate the command's order line to its (already loaded) product.
+    Shared by allocate and allocate_many.
+    """
+    if product is None:
+        raise InvalidSku(f"Invalid SKU {command.sku}")
+    line = models.OrderLine(command.orderid, command.sku, command.qty)
+    return product.allocate(line)
+
 def allocate(command: commands.Allocate, uow: AbstractUnitOfWork):
     """
     Handle the Allocate command by allocating an order line to a batch.
     """
-    line = models.OrderLine(command.orderid, command.sku, command.qty)
     with uow:
         product = uow.products.get(sku=command.sku)
-        if product is None:
-            raise InvalidSku(f"Invalid SKU {command.sku}")
-        
+        batchref = _allocate_to_product(command, product)
+        uow.commit()
+        return batchref
+
+def allocate_many(cmds: List[commands.Allocate], uow: AbstractUnitOfWork) -> Iterator[Optional[str]]:
+    """
+    Handle a run of Allocate commands, loading every product they touch in one query.
+    Yields each command's batch reference as soon as it is allocated, so the
+    caller can collect that command's events before the next one runs.
+    """
+    with uow:
+        products = uow.products.get_many(dict.fromkeys(command.sku for command in cmds))
         try:
-            batchref = product.allocate(line)
+            for command in cmds:
+                yield _allocate_to_product(command, products.get(command.sku))
+        except (InvalidSku, CannotAllocateError):
+            # Keep the allocations made before the failure, as handling
+            # the commands one at a time would have
             uow.commit()
-            return batchref
-        except CannotAllocateError:
-            raise  # Bubble up the domain exception for higher-level handling
+            raise
+        uow.commit()
 
 def change_batch_quantity(command: commands.ChangeBatchQuantity, uow: AbstractUnitOfWork):
     """
@@ -54,3 +81,16 @@ def change_batch_quantity(command: commands.ChangeBatchQuantity, uow: AbstractUn
         product.change_batch_quantity(ref=command.ref, qty=command.qty)
         uow.commit()
 
+def publish_allocated_event(event: events.BatchAllocated, uow: AbstractUnitOfWork):
+    """
+    Publish a BatchAllocated event to external consumers.
+    There is no message broker adapter yet, so the event is only logged.
+    """
+    logger.info("Allocated: %s", event)
+
+def send_out_of_stock_notification(event: events.OutOfStock, uow: AbstractUnitOfWork):
+    """
+    Notify that a SKU has run out of stock.
+    There is no notification adapter yet, so the event is only logged.
+    """
+    logger.warning("Out of stock for %s", event.sku)
\ No newline at end of file
@@ -1,10 +1,13 @@
 # src/allocation/service_layer/messagebus.py
 import logging
-from typing import Callable, Dict, List, Type, Union
+from collections import deque
+from typing import Callable, Deque, Dict, List, Sequence, Type, Union
 
 from allocation.domain import commands, events
 from allocation.service_layer import handlers, ports
 
+logger = logging.getLogger(__name__)
+
 Message = Union[commands.Command, events.Event]
 
 # --- Handler Registries --- #
@@ -16,49 +19,139 @@ COMMAND_HANDLERS: Dict[Type[commands.Command], Callable] = {
 }
 
 EVENT_HANDLERS: Dict[Type[events.Event], List[Callable]] = {
-    events.Allocated: [handlers.publish_allocated_event],
+    events.BatchAllocated: [handlers.publish_allocated_event],
     events.OutOfStock: [handlers.send_out_of_stock_notification],
 }
 
+# Handlers that take a whole run of consecutive commands at once, keyed by
+# the single-command handler they stand in for. Only used while that handler
+# is still the one registered in COMMAND_HANDLERS.
+BATCH_HANDLERS: Dict[Callable, Callable] = {
+    handlers.allocate: handlers.allocate_many,
+}
+
 
 # --- Dispatch Logic --- #
 
-def handle_event(event: events.Event, queue: List[Message], uow: ports.AbstractUnitOfWork):
-    for handler in EVENT_HANDLERS.get(type(event), []):
+def _event_handlers_for(event_type: type) -> List[Callable]:
+    """
+    Handlers for an event type with no entry of its own: those of its
+    nearest registered base class, or none.
+    """
+    for base in event_type.__mro__:
+        event_handlers = EVENT_HANDLERS.get(base)
+        if event_handlers is not None:
+            return event_handlers
+    return []
+
+
+def handle_event(event: events.Event, queue: Deque[Message], uow: ports.AbstractUnitOfWork):
+    # Looked up per event so later changes to EVENT_HANDLERS take effect
+    event_handlers = EVENT_HANDLERS.get(type(event))
+    if event_handlers is None:
+        event_handlers = _event_handlers_for(type(event))
+    for handler in event_handlers:
         try:
-            logging.debug("handling event %s with handler %s", event, handler)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("handling event %s with handler %s", event, handler)
             handler(event, uow=uow)
             queue.extend(uow.collect_new_events())
         except Exception:
-            logging.exception("Exception handling event %s", event)
+            logger.exception("Exception handling event %s", event)
             continue
 
 
-def handle_command(command: commands.Command, queue: List[Message], uow: ports.AbstractUnitOfWork):
+def handle_command(command: commands.Command, queue: Deque[Message], uow: ports.AbstractUnitOfWork):
     handler = COMMAND_HANDLERS[type(command)]
-    logging.debug("handling command %s with handler %s", command, handler)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("handling command %s with handler %s", command, handler)
+    # Command failures propagate to the caller of handle(), which reports them
+    result = handler(command, uow=uow)
+    queue.extend(uow.collect_new_events())
+    return result
+
+
+def handle_command_run(
+    cmds: List[commands.Command],
+    batch_handler: Callable,
+    queue: Deque[Message],
+    uow: ports.AbstractUnitOfWork,
+):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("handling %d commands with handler %s", len(cmds), batch_handler)
+    results = []
+    # The batch handler yields after each command, so events are queued in
+    # the same order as when the commands are handled one at a time
+    run = batch_handler(cmds, uow=uow)
     try:
-        result = handler(command, uow=uow)
-        queue.extend(uow.collect_new_events())
-        return result
-    except Exception:
-        logging.exception("Exception handling command %s", command)
-        raise
+        for result in run:
+            results.append(result)
+            queue.extend(uow.collect_new_events())
+    finally:
+        # Leave the handler's unit of work now if we stopped early, rather
+        # than whenever the suspended generator is collected
+        run.close()
+    return results
+
+
+def _take_run(first: commands.Command, queue: Deque[Message]) -> List[commands.Command]:
+    """
+    Pop the commands of the same type queued directly behind `first`, so a
+    batch handler can process the whole run at once.
+    """
+    command_type = type(first)
+    run = [first]
+    while queue and type(queue[0]) is command_type:
+        run.append(queue.popleft())
+    return run
 
 
-def handle(message: Message, uow: ports.AbstractUnitOfWork):
+def _route_event(event: events.Event, queue: Deque[Message], uow: ports.AbstractUnitOfWork, results: List):
+    handle_event(event, queue, uow)
+
+
+def _route_command(command: commands.Command, queue: Deque[Message], uow: ports.AbstractUnitOfWork, results: List):
+    batch_handler = BATCH_HANDLERS.get(COMMAND_HANDLERS.get(type(command)))
+    if batch_handler is not None and queue and type(queue[0]) is type(command):
+        results.extend(handle_command_run(_take_run(command, queue), batch_handler, queue, uow))
+    else:
+        results.append(handle_command(command, queue, uow))
+
+
+# Registered message types routed straight to their dispatcher, so the hot
+# path looks up type(msg) instead of walking the MRO with isinstance().
+_DISPATCH: Dict[type, Callable] = {
+    **{event_type: _route_event for event_type in EVENT_HANDLERS},
+    **{command_type: _route_command for command_type in COMMAND_HANDLERS},
+}
+
+
+def _fallback_dispatcher(msg: Message) -> Callable:
+    """
+    Resolve the dispatcher for a message type missing from _DISPATCH.
+    """
+    if isinstance(msg, events.Event):
+        return _route_event
+    if isinstance(msg, commands.Command):
+        return _route_command
+    raise Exception(f"Unknown message type: {msg}")
+
+
+def handle(message: Union[Message, Sequence[Message]], uow: ports.AbstractUnitOfWork):
+    """
+    Handle a message, or a sequence of messages in order, along with every
+    event they raise. Consecutive commands in a sequence may be handled
+    together by a handler in BATCH_HANDLERS.
+    """
     results = []
-    queue = [message]
+    if isinstance(message, (list, tuple)):
+        queue: Deque[Message] = deque(message)
+    else:
+        queue = deque([message])
 
     while queue:
-        msg = queue.pop(0)
+        msg = queue.popleft()
+        dispatcher = _DISPATCH.get(type(msg)) or _fallback_dispatcher(msg)
+        dispatcher(msg, queue, uow, results)
 
-        if isinstance(msg, events.Event):
-            handle_event(msg, queue, uow)
-        elif isinstance(msg, commands.Command):
-            result = handle_command(msg, queue, uow)
-            results.append(result)
-        else:
-            raise Exception(f"Unknown message type: {msg}")
-
-    return results
+    return results
\ No newline at end of file
@@ -1,7 +1,7 @@
 from __future__ import annotations
-from typing import Protocol, Optional, Type
+from typing import Iterable, Iterator, Protocol, Optional, Type
 from types import TracebackType
-from allocation.domain import models
+from allocation.domain import events, models
 
 class AbstractProductRepository(Protocol):
     """
@@ -9,6 +9,8 @@ class AbstractProductRepository(Protocol):
     """
     def add(self, product: models.Product) -> None: ...
     def get(self, sku: str) -> models.Product | None: ...
+    def get_by_batchref(self, ref: str) -> models.Product | None: ...
+    def get_many(self, skus: Iterable[str]) -> dict[str, models.Product]: ...
     def list(self) -> list[models.Product]: ...
 
 class AbstractUnitOfWork(Protocol):
@@ -25,4 +27,5 @@ class AbstractUnitOfWork(Protocol):
         traceback: Optional[TracebackType]
     ) -> None: ...
     def commit(self) -> None: ...
+    def collect_new_events(self) -> Iterator[events.Event]: ...
     def rollback(self) -> None: ...
\ No newline at end of file
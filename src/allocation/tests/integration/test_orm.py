@@ -0,0 +1,92 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import clear_mappers, sessionmaker
+
+from allocation.adapters import orm
+from allocation.adapters.repository import SqlAlchemyProductRepository
+from allocation.domain import models
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # A file database, so separate connections really are separate
+    engine = create_engine(f"sqlite:///{tmp_path / 'allocation.db'}")
+    orm.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    orm.start_mappers()
+    yield sessionmaker(bind=engine)
+    clear_mappers()
+
+
+def insert_batch(connection, ref, sku, qty):
+    connection.execute(insert(orm.products).values(sku=sku, version_number=1))
+    return connection.execute(
+        insert(orm.batches).values(reference=ref, sku=sku, purchased_quantity=qty)
+    ).inserted_primary_key[0]
+
+
+def insert_allocation(connection, batch_id, orderid, sku, qty):
+    orderline_id = connection.execute(
+        insert(orm.order_lines).values(orderid=orderid, sku=sku, qty=qty)
+    ).inserted_primary_key[0]
+    connection.execute(insert(orm.allocations).values(orderline_id=orderline_id, batch_id=batch_id))
+
+
+def test_allocated_qty_reflects_allocations_committed_elsewhere(engine, session_factory):
+    with engine.begin() as connection:
+        insert_batch(connection, "batch1", "LAMP", 10)
+
+    session = session_factory()
+    batch = SqlAlchemyProductRepository(session).get("LAMP").batches[0]
+    assert batch.allocated_qty == 0
+
+    with engine.begin() as connection:
+        batch_id = connection.execute(orm.batches.select()).one().id
+        insert_allocation(connection, batch_id, "order1", "LAMP", 8)
+    session.commit()
+
+    assert batch.allocated_qty == 8
+    assert batch.available_qty == 2
+    session.close()
+
+
+def test_deallocate_on_a_loaded_batch_subtracts_the_line_once(engine, session_factory):
+    with engine.begin() as connection:
+        batch_id = insert_batch(connection, "batch1", "LAMP", 10)
+        insert_allocation(connection, batch_id, "order1", "LAMP", 3)
+        insert_allocation(connection, batch_id, "order2", "LAMP", 5)
+
+    session = session_factory()
+    batch = SqlAlchemyProductRepository(session).get("LAMP").batches[0]
+    line = batch._allocations["order1", "LAMP"]
+
+    # The running total has not been computed since loading
+    batch.deallocate(line)
+
+    assert batch.allocated_qty == 5
+    session.commit()
+    assert batch.allocated_qty == 5
+    session.close()
+
+
+def test_batches_load_in_allocation_preference_order(engine, session_factory):
+    with engine.begin() as connection:
+        connection.execute(insert(orm.products).values(sku="LAMP", version_number=1))
+        connection.execute(insert(orm.batches), [
+            {"reference": "later", "sku": "LAMP", "purchased_quantity": 10, "eta": date(2030, 2, 1)},
+            {"reference": "in-stock", "sku": "LAMP", "purchased_quantity": 10, "eta": None},
+            {"reference": "sooner", "sku": "LAMP", "purchased_quantity": 10, "eta": date(2030, 1, 1)},
+        ])
+
+    session = session_factory()
+    product = SqlAlchemyProductRepository(session).get("LAMP")
+
+    assert [batch.reference for batch in product.batches] == ["in-stock", "sooner", "later"]
+    session.close()
@@ -0,0 +1,58 @@
+import pytest
+
+from allocation.domain.exceptions import CannotAllocateError
+from allocation.domain.models import Batch, OrderLine
+
+
+def make_batch(qty=20):
+    return Batch("batch-001", "SMALL-TABLE", qty)
+
+
+def test_allocating_the_same_line_twice_is_idempotent():
+    batch = make_batch()
+    line = OrderLine("order-1", "SMALL-TABLE", 2)
+
+    batch.allocate(line)
+    batch.allocate(line)
+
+    assert batch.available_qty == 18
+    assert len(batch.events) == 1
+
+
+def test_same_order_and_sku_with_a_different_qty_is_rejected():
+    batch = make_batch()
+    batch.allocate(OrderLine("order-1", "SMALL-TABLE", 2))
+
+    with pytest.raises(CannotAllocateError) as excinfo:
+        batch.allocate(OrderLine("order-1", "SMALL-TABLE", 5))
+
+    assert excinfo.value.reason == "conflicting_allocation"
+    assert excinfo.value.batchref == "batch-001"
+    assert batch.available_qty == 18
+
+
+def test_deallocate_removes_the_allocated_line():
+    batch = make_batch()
+    line = OrderLine("order-1", "SMALL-TABLE", 2)
+    batch.allocate(line)
+
+    batch.deallocate(line)
+
+    assert batch.available_qty == 20
+
+
+def test_deallocate_ignores_a_line_that_only_shares_the_key():
+    batch = make_batch()
+    batch.allocate(OrderLine("order-1", "SMALL-TABLE", 2))
+
+    batch.deallocate(OrderLine("order-1", "SMALL-TABLE", 5))
+
+    assert batch.available_qty == 18
+
+
+def test_deallocate_ignores_unallocated_lines():
+    batch = make_batch()
+
+    batch.deallocate(OrderLine("order-1", "SMALL-TABLE", 2))
+
+    assert batch.available_qty == 20
@@ -0,0 +1,71 @@
+import pickle
+
+import pytest
+
+from allocation.domain.exceptions import CannotAllocateError
+
+
+@pytest.mark.parametrize("error, message", [
+    (CannotAllocateError.out_of_stock("o1", "CHAIR", 3),
+     "Cannot allocate 3 units of SKU 'CHAIR' for order 'o1'."),
+    (CannotAllocateError.insufficient_stock("b1", "o1", "CHAIR", 3),
+     "Batch b1 cannot allocate 3 units of CHAIR."),
+    (CannotAllocateError.sku_mismatch("o1", "CHAIR", 3, "LAMP"),
+     "SKU mismatch: CHAIR not in product LAMP"),
+    (CannotAllocateError.conflicting_allocation("b1", "o1", "CHAIR", 3),
+     "Batch b1 already holds order 'o1' for CHAIR with a quantity other than 3."),
+])
+def test_factories_format_their_template(error, message):
+    assert str(error) == error.message == message
+    assert (error.orderid, error.sku, error.qty) == ("o1", "CHAIR", 3)
+    assert error.args == (None,)
+
+
+def test_factories_only_set_the_details_their_reason_uses():
+    error = CannotAllocateError.insufficient_stock("b1", "o1", "CHAIR", 3)
+
+    assert error.reason == "insufficient_stock"
+    assert error.batchref == "b1"
+    assert error.product_sku is None
+
+
+def test_factories_require_their_fields():
+    with pytest.raises(TypeError):
+        CannotAllocateError.insufficient_stock("o1", "CHAIR", 3)
+
+
+def test_message_only_error_has_no_reason():
+    error = CannotAllocateError("boom")
+
+    assert error.reason is None
+    assert error.args == ("boom",)
+    assert str(error) == "boom"
+    assert repr(error) == "CannotAllocateError('boom')"
+
+
+def test_unknown_reason_is_rejected():
+    with pytest.raises(ValueError, match="Unknown CannotAllocateError reason"):
+        CannotAllocateError(reason="backordered", orderid="o1", sku="CHAIR", qty=3)
+
+
+def test_repr_lists_the_details_that_were_given():
+    error = CannotAllocateError.sku_mismatch("o1", "CHAIR", 3, "LAMP")
+
+    assert repr(error) == (
+        "CannotAllocateError(reason='sku_mismatch', orderid='o1', sku='CHAIR', qty=3, "
+        "product_sku='LAMP')"
+    )
+
+
+@pytest.mark.parametrize("error", [
+    CannotAllocateError("boom"),
+    CannotAllocateError.out_of_stock("o1", "CHAIR", 3),
+    CannotAllocateError.insufficient_stock("b1", "o1", "CHAIR", 3),
+])
+def test_errors_survive_pickling(error):
+    restored = pickle.loads(pickle.dumps(error))
+
+    assert type(restored) is CannotAllocateError
+    assert repr(restored) == repr(error)
+    assert str(restored) == str(error)
+    assert restored.args == error.args
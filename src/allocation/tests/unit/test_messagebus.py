@@ -0,0 +1,190 @@
+from datetime import date
+
+import pytest
+
+from allocation.domain import commands, events, models
+from allocation.service_layer import handlers, messagebus
+
+
+class FakeRepository:
+    def __init__(self, products):
+        self._products = {product.sku: product for product in products}
+        self.seen = []
+        self.get_calls = 0
+        self.get_many_calls = 0
+
+    def _track(self, product):
+        if product is not None and product not in self.seen:
+            self.seen.append(product)
+        return product
+
+    def add(self, product):
+        self._products[product.sku] = product
+        self._track(product)
+
+    def get(self, sku):
+        self.get_calls += 1
+        return self._track(self._products.get(sku))
+
+    def get_by_batchref(self, ref):
+        for product in self._products.values():
+            if any(batch.reference == ref for batch in product.batches):
+                return self._track(product)
+        return None
+
+    def get_many(self, skus):
+        self.get_many_calls += 1
+        return {sku: self._track(self._products[sku]) for sku in skus if sku in self._products}
+
+    def list(self):
+        return list(self._products.values())
+
+
+class FakeUnitOfWork:
+    def __init__(self, products=()):
+        self.products = FakeRepository(products)
+        self.commits = 0
+        self.rollbacks = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.rollback()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def collect_new_events(self):
+        for product in self.products.seen:
+            for batch in product.batches:
+                while batch.events:
+                    yield batch.events.pop(0)
+
+
+def make_uow(*skus):
+    return FakeUnitOfWork([
+        models.Product(sku, [models.Batch(f"{sku}-batch", sku, 10, eta=date(2030, 1, 1))])
+        for sku in skus
+    ])
+
+
+@pytest.fixture
+def handled_events(monkeypatch):
+    handled = []
+    for event_type in messagebus.EVENT_HANDLERS:
+        monkeypatch.setitem(
+            messagebus.EVENT_HANDLERS, event_type, [lambda event, uow: handled.append(event)],
+        )
+    return handled
+
+
+def test_unknown_message_type_is_rejected():
+    with pytest.raises(Exception, match="Unknown message type"):
+        messagebus.handle(object(), make_uow())
+
+
+def test_unregistered_event_subclass_is_dispatched_via_fallback(handled_events):
+    class Restocked(events.OutOfStock):
+        pass
+
+    messagebus.handle(Restocked(sku="CHAIR"), make_uow())
+
+    assert handled_events == [Restocked(sku="CHAIR")]
+
+
+def test_run_of_allocates_loads_products_once():
+    uow = make_uow("CHAIR", "LAMP")
+
+    results = messagebus.handle([
+        commands.Allocate("o1", "CHAIR", 2),
+        commands.Allocate("o2", "LAMP", 3),
+    ], uow)
+
+    assert results == ["CHAIR-batch", "LAMP-batch"]
+    assert uow.products.get_many_calls == 1
+    assert uow.products.get_calls == 0
+
+
+def test_single_allocate_uses_the_registered_handler():
+    uow = make_uow("CHAIR")
+
+    assert messagebus.handle(commands.Allocate("o1", "CHAIR", 2), uow) == ["CHAIR-batch"]
+    assert uow.products.get_many_calls == 0
+
+
+def test_run_keeps_earlier_allocations_when_a_later_one_fails():
+    uow = make_uow("CHAIR")
+    chair = uow.products._products["CHAIR"]
+
+    with pytest.raises(handlers.InvalidSku):
+        messagebus.handle([
+            commands.Allocate("o1", "CHAIR", 2),
+            commands.Allocate("o2", "MISSING", 1),
+            commands.Allocate("o3", "CHAIR", 1),
+        ], uow)
+
+    assert chair.batches[0].allocated_qty == 2
+    assert uow.commits == 1  # the allocations before the failure
+
+
+def test_run_queues_events_in_the_same_order_as_one_at_a_time(handled_events, monkeypatch):
+    queued = [
+        commands.Allocate("o1", "CHAIR", 2),
+        commands.Allocate("o2", "LAMP", 10),
+        commands.Allocate("o3", "CHAIR", 3),
+    ]
+
+    batched_results = messagebus.handle(queued, make_uow("CHAIR", "LAMP"))
+    batched_events = list(handled_events)
+
+    handled_events.clear()
+    monkeypatch.setattr(messagebus, "BATCH_HANDLERS", {})
+    sequential_results = messagebus.handle(queued, make_uow("CHAIR", "LAMP"))
+
+    assert batched_results == sequential_results
+    assert batched_events == handled_events
+    assert [type(event) for event in batched_events] == [
+        events.BatchAllocated, events.BatchAllocated, events.OutOfStock, events.BatchAllocated,
+    ]
+
+
+def test_run_respects_an_injected_allocate_handler(monkeypatch):
+    seen = []
+    monkeypatch.setitem(
+        messagebus.COMMAND_HANDLERS, commands.Allocate,
+        lambda command, uow: seen.append(command.orderid) or "injected",
+    )
+    uow = make_uow("CHAIR")
+
+    results = messagebus.handle([
+        commands.Allocate("o1", "CHAIR", 2),
+        commands.Allocate("o2", "CHAIR", 3),
+    ], uow)
+
+    assert results == ["injected", "injected"]
+    assert seen == ["o1", "o2"]
+    assert uow.products.get_many_calls == 0
+
+
+def test_run_leaves_the_unit_of_work_when_interrupted():
+    class FailingUnitOfWork(FakeUnitOfWork):
+        def collect_new_events(self):
+            raise RuntimeError("event collection failed")
+
+    uow = FailingUnitOfWork(make_uow("CHAIR").products.list())
+
+    try:
+        messagebus.handle([
+            commands.Allocate("o1", "CHAIR", 2),
+            commands.Allocate("o2", "CHAIR", 3),
+        ], uow)
+    except RuntimeError:
+        # Checked while the traceback still holds the bus's frames
+        assert uow.rollbacks == 1
+    else:
+        pytest.fail("RuntimeError not raised")
+    assert uow.commits == 0